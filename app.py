@@ -1,49 +1,88 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
-from binance.um_futures import UMFutures as Client
+import requests
 from datetime import datetime
-import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 # --- 配置区 ---
 SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT']
 PERIOD = '4h' 
 WINDOW_SIZE = 42  # 7天平滑窗口 (42 * 4h = 168h = 7 days)
-
-# --- API 密钥集成 ---
-# 建议在 Streamlit Secrets 或 环境变量中设置，为了方便你修改，这里预留位置
-BINANCE_KEY = st.secrets.get("api_key", "")
-BINANCE_SECRET = st.secrets.get("api_secret", "")
-client = Client(key=BINANCE_KEY, secret=BINANCE_SECRET)
+# 请求的K线数量。adjust=False 的 EMA 中首根数据权重为 (1-alpha)^(LIMIT-1)：
+# 100 根约 0.9%，60 根约 6%，32 根约 23%，再减少会明显改变指标数值
+LIMIT = 100
+CACHE_TTL = 300  # 数据缓存秒数，4h K线数据无需每 10 秒重新请求
+URL = "https://fapi.binance.com/futures/data/globalLongShortAccountRatio"  # 公共接口，无需 API 密钥
+TIMEOUT = 5  # 单次请求超时秒数
+
+# --- Secrets 配置 ---
+def _read_refresh_seconds(default=10):
+    """面板刷新间隔 (秒)，可在 Secrets 中通过 refresh_seconds 调整，没有 secrets 文件时使用默认值"""
+    try:
+        value = st.secrets.get("refresh_seconds", default)
+    except FileNotFoundError:
+        # 未配置 secrets.toml 时 (StreamlitSecretNotFoundError) 直接使用默认值
+        return default
+    
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError(f"refresh_seconds 必须为正整数，当前值: {value!r}")
+    return value
+
+# 建议频率不宜过快，防止被币安封禁IP
+REFRESH_SECONDS = _read_refresh_seconds()
+
+# Streamlit 每次重跑都会重新执行本脚本，Session 与线程池用 cache_resource 在进程内只创建一次
+@st.cache_resource
+def get_session():
+    """直接请求 REST 接口，各线程共用同一个 Session，连接保持存活 (keep-alive)"""
+    return requests.Session()
+
+@st.cache_resource
+def get_executor():
+    """各币种请求并发执行，总耗时取决于最慢的一次请求而非四次之和"""
+    return ThreadPoolExecutor(max_workers=len(SYMBOLS))
+
+SESSION = get_session()
+EXECUTOR = get_executor()
+
+@lru_cache(maxsize=None)
+def _ema_weights(n):
+    """长度为 n 的 EMA(adjust=False) 权重，最后一个 EMA 值 = 权重 · 数据"""
+    alpha = 2 / (WINDOW_SIZE + 1)
+    weights = alpha * (1 - alpha) ** np.arange(n - 1, -1, -1)
+    # 首个数据点作为 EMA 初值，权重为 (1-alpha)^(n-1)
+    weights[0] = (1 - alpha) ** (n - 1)
+    return weights
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _fetch_ratio(symbol):
+    """拉取原始多空人数比数据 (按 CACHE_TTL 缓存，异常不会被缓存)"""
+    resp = SESSION.get(URL, params={'symbol': symbol, 'period': PERIOD, 'limit': LIMIT}, timeout=TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
 
 def get_data(symbol):
     """获取并处理平滑后的多空人数占比"""
     try:
-        # 尝试方案 A (当前版本最通用的方法名)
-        try:
-            data = client.global_long_short_account_ratio(symbol=symbol, period=PERIOD, limit=100)
-        except AttributeError:
-            # 尝试方案 B (备选方法名)
-            data = client.global_long_short_accounts(symbol=symbol, period=PERIOD, limit=100)
+        data = _fetch_ratio(symbol)
         
         if not data or len(data) == 0:
             return 50.0, 50.0, "API返回数据为空 (请检查币种符号)"
             
-        df = pd.DataFrame(data)
-        
         # 币安返回的字段可能是 longAccount 或 longAccountRatio
         # 我们做一个兼容性处理
-        target_col = 'longAccount' if 'longAccount' in df.columns else 'longAccountRatio'
+        target_col = 'longAccount' if 'longAccount' in data[0] else 'longAccountRatio'
         
-        if target_col not in df.columns:
-            return 50.0, 50.0, f"找不到数据列，现有列: {list(df.columns)}"
+        if target_col not in data[0]:
+            return 50.0, 50.0, f"找不到数据列，现有列: {list(data[0])}"
 
-        df[target_col] = df[target_col].astype(float)
+        # 只用到一列，直接解析为 float 数组，无需构造 DataFrame
+        x = np.fromiter((float(row[target_col]) for row in data), dtype=np.float64, count=len(data))
         
-        # 7天EMA平滑 (核心算法)
-        df['smoothed_long'] = df[target_col].ewm(span=WINDOW_SIZE, adjust=False).mean() * 100
-        
-        long_pc = round(df['smoothed_long'].iloc[-1], 2)
+        # 7天EMA平滑 (核心算法)，只需最后一个值，用权重点积代替逐点递推
+        long_pc = round(float(_ema_weights(len(x)) @ x) * 100, 2)
         short_pc = round(100 - long_pc, 2)
         
         return long_pc, short_pc, None
@@ -52,30 +91,15 @@ def get_data(symbol):
         # 返回具体的错误字符串
         return 50.0, 50.0, f"调试信息: {str(e)}"
 
+@lru_cache(maxsize=512)
 def create_sentiment_bar(symbol, long_pc, short_pc):
-    """创建符合需求的红绿对抗进度条"""
-    fig = go.Figure()
-
-    # 看空部分 (红色 - 左侧)
-    fig.add_trace(go.Bar(
-        y=[symbol], x=[short_pc],
-        name='Short',
+    """创建符合需求的红绿对抗进度条 (相同数值复用已构建的图表，调用方勿修改返回值)"""
+    # 看空 (红色 - 左侧) 与看多 (绿色 - 右侧) 共用一条 Bar，在同一 y 上堆叠，减少传给前端的数据量
+    fig = go.Figure(go.Bar(
+        y=[symbol, symbol], x=[short_pc, long_pc],
         orientation='h',
-        marker=dict(color='#FF4B4B'),
-        text=f"看空 {short_pc}%",
-        textposition='inside',
-        insidetextanchor='middle',
-        textfont=dict(size=14, color='white'),
-        hoverinfo='none'
-    ))
-
-    # 看多部分 (绿色 - 右侧)
-    fig.add_trace(go.Bar(
-        y=[symbol], x=[long_pc],
-        name='Long',
-        orientation='h',
-        marker=dict(color='#00CC96'),
-        text=f"看多 {long_pc}%",
+        marker=dict(color=['#FF4B4B', '#00CC96']),
+        text=[f"看空 {short_pc}%", f"看多 {long_pc}%"],
         textposition='inside',
         insidetextanchor='middle',
         textfont=dict(size=14, color='white'),
@@ -109,41 +133,34 @@ st.markdown("""
 st.title("📊 币安中线情绪对抗动态图")
 st.caption(f"模拟社区投票器逻辑 (7天EMA平滑) | 数据源: Binance Global Account Ratio")
 
-placeholder = st.empty()
-
-# 渲染循环
-while True:
-    with placeholder.container():
-        st.write(f"最后刷新时间: {datetime.now().strftime('%H:%M:%S')}")
+# 只有情绪面板按 REFRESH_SECONDS 定时重跑，标题与样式每个会话只渲染一次
+@st.fragment(run_every=REFRESH_SECONDS)
+def render_panel():
+    st.write(f"最后刷新时间: {datetime.now().strftime('%H:%M:%S')}")
+    
+    results = list(EXECUTOR.map(get_data, SYMBOLS))
+    
+    for symbol, (long_v, short_v, error) in zip(SYMBOLS, results):
         
-        for symbol in SYMBOLS:
-            long_v, short_v, error = get_data(symbol)
+        with st.container():
+            col_text, col_bar = st.columns([1, 5])
+            with col_text:
+                st.markdown(f"### {symbol[:3]}")
+                if error:
+                    st.error(f"异常详情: {error}")        #st.error("接口异常")
+                elif long_v >= 65:
+                    st.warning("🔴 极度看多(反向预警)")
+                elif long_v <= 35:
+                    st.success("🟢 极度看空(反向预警)")
             
-            with st.container():
-                col_text, col_bar = st.columns([1, 5])
-                with col_text:
-                    st.markdown(f"### {symbol[:3]}")
-                    if error:
-                        st.error(f"异常详情: {error}")        #st.error("接口异常")
-                    elif long_v >= 65:
-                        st.warning("🔴 极度看多(反向预警)")
-                    elif long_v <= 35:
-                        st.success("🟢 极度看空(反向预警)")
-                
-                with col_bar:
-                    # 使用 time.time() 确保 ID 唯一，修复 DuplicateElementId 报错
-                    unique_key = f"chart_{symbol}_{time.time()}"
-                    st.plotly_chart(
-                        create_sentiment_bar(symbol, long_v, short_v), 
-                        use_container_width=True, 
-                        config={'displayModeBar': False},
-                        key=unique_key
-                    )
-            st.write("") 
-
-
-        time.sleep(10) # 建议频率不宜过快，防止被币安封禁IP
-
-
-
-
+            with col_bar:
+                # 每次 fragment 重跑都是独立的运行，按币种固定 key 即可
+                st.plotly_chart(
+                    create_sentiment_bar(symbol, long_v, short_v), 
+                    use_container_width=True, 
+                    config={'displayModeBar': False},
+                    key=f"chart_{symbol}"
+                )
+        st.write("") 
+
+render_panel()